@@ -1,26 +1,199 @@
 """
 Fuel Logger Backend — Full Edition
-Run with: python -m pip install flask flask-cors && python fuel_server.py
+Run with: python -m pip install flask flask-cors msgspec orjson waitress && python fuel_server.py
 Then open fuel_logger.html in your browser.
+Set FUEL_LOG_DEBUG=1 to use Flask's debug server with the auto-reloader instead.
 """
 
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from collections import defaultdict
+from contextlib import contextmanager
+from typing import Annotated, Literal, Optional, Union
+import math
+import msgspec
+import orjson
+import os
+import queue
 import sqlite3
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Encode jsonify() responses with orjson.
+
+    Parsing (request.get_json()) stays on the stdlib provider, which fails
+    deeply nested input with a RecursionError instead of crashing.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-DB_PATH = "fuel_log.db"
+DB_PATH           = "fuel_log.db"
+POOL_SIZE         = 8
+CACHED_STATEMENTS = 256
+BUSY_TIMEOUT_MS   = 30000
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared by all requests.
+
+    Connections are opened lazily, configured once, and handed back to the
+    pool after each request instead of being closed and reopened.
+    """
+
+    # busy_timeout goes first so even switching to WAL waits out a held lock
+    PRAGMAS = (
+        f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-20000",
+    )
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path  = path
+        self._idle = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(None)    # empty slot, connected on first borrow
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                               cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        # Planner stats maintenance stays off the request path: once when the
+        # connection opens (SQLite's advice for long-lived connections) and
+        # again in close().
+        self._optimize(conn, "PRAGMA optimize=0x10002")
+        return conn
+
+    @staticmethod
+    def _optimize(conn, pragma="PRAGMA optimize"):
+        # Best effort: skipped if a concurrent writer holds the lock
+        try:
+            conn.execute(pragma)
+        except sqlite3.OperationalError:
+            pass
+
+    @contextmanager
+    def borrow(self):
+        conn = self._idle.get()
+        try:
+            if conn is None:
+                conn = self._connect()
+            yield conn
+        finally:
+            try:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        """Optimize and close every idle connection; call once at shutdown."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if conn is not None:
+                self._optimize(conn)
+                conn.close()
+
+pool = ConnectionPool(DB_PATH)
+
+def json_rows(cursor):
+    """Serialise a cursor's result set straight into a JSON array response."""
+    cols = [d[0] for d in cursor.description]
+    body = orjson.dumps([dict(zip(cols, row)) for row in cursor])
+    return app.response_class(body, mimetype="application/json")
+
+def json_document(cursor):
+    """Send a query's single JSON text column (built by SQLite) as the response body."""
+    return app.response_class(cursor.fetchone()[0], mimetype="application/json")
+
+def version_tag(conn, sql, args=()):
+    """Collapse a row of counts / max ids, which moves on every write, into an ETag."""
+    return "-".join(str(v) for v in conn.execute(sql, args).fetchone())
+
+def tagged(resp, tag):
+    """Attach tag as the ETag and make browsers revalidate it on every poll."""
+    resp.set_etag(tag)
+    resp.cache_control.no_cache = True
+    resp.vary.add("Accept")
+    return resp
+
+def not_modified(tag):
+    """Bodyless 304 if the client's If-None-Match already holds tag, else None.
+
+    If-None-Match uses weak comparison, so a W/ copy of the tag (as proxies
+    that re-encode the body send back) still matches.
+    """
+    if not request.if_none_match.contains_weak(tag):
+        return None
+    return tagged(app.response_class(status=304), tag)
+
+def wants_ndjson():
+    """True when the client explicitly prefers newline-delimited JSON."""
+    best = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+    return best == "application/x-ndjson"
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def ndjson_rows(sql, args=()):
+    """Stream a query's rows as newline-delimited JSON, one object per line.
+
+    The connection is borrowed inside the generator so it stays checked out
+    only while the response body is being sent.
+    """
+    def generate():
+        with pool.borrow() as conn:
+            cursor = conn.execute(sql, args)
+            cols   = [d[0] for d in cursor.description]
+            for row in cursor:
+                yield orjson.dumps(dict(zip(cols, row))) + b"\n"
+    return app.response_class(generate(), mimetype="application/x-ndjson")
+
+NonEmptyStr   = Annotated[str,   msgspec.Meta(min_length=1)]
+PositiveFloat = Annotated[float, msgspec.Meta(gt=0)]
+# Optional numeric form fields may arrive blank; "" is stored as NULL
+BlankableFloat = Optional[Union[float, Literal[""]]]
+
+class EntryIn(msgspec.Struct):
+    """Base for POST payload structs; rejects inf/nan in any numeric field.
+
+    strict=False turns "inf", "Infinity" and "nan" strings into floats, and
+    Meta bounds don't exclude infinity, so this is checked once decoded.
+    """
+
+    def __post_init__(self):
+        for name in self.__struct_fields__:
+            value = getattr(self, name)
+            if isinstance(value, float) and not math.isfinite(value):
+                # msgspec reports this as a ValidationError (a 400)
+                raise ValueError(f"`{name}` must be a finite number")
+
+def decode_entries(entry_type):
+    """Decode the raw request body as one entry_type struct or a list of them.
+
+    Numeric strings are accepted for numeric fields (strict=False), since the
+    browser client posts form values as strings.
+    """
+    return msgspec.json.decode(request.get_data(), type=entry_type | list[entry_type], strict=False)
+
+def insert_batch(conn, sql, params):
+    """Insert every parameter tuple in one write transaction; return the new ids."""
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(sql, params)
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    conn.execute("COMMIT")
+    # Rowids are handed out consecutively while we hold the write lock
+    return list(range(last_id - len(params) + 1, last_id + 1))
 
 def init_db():
-    with get_db() as conn:
+    with pool.borrow() as conn:
         conn.execute("""
             CREATE TABLE IF NOT EXISTS cars (
                 id              INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -44,11 +217,30 @@ def init_db():
                 FOREIGN KEY (car_id) REFERENCES cars(id)
             )
         """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS categories (
+                id              INTEGER PRIMARY KEY,
+                name            TEXT NOT NULL UNIQUE
+            )
+        """)
+        conn.executemany(
+            "INSERT OR IGNORE INTO categories (id, name) VALUES (?, ?)",
+            [(cid, name) for name, cid in CAT_TO_ID.items()]
+        )
+
+        # Databases created before the categories table store the name itself;
+        # rebuild those service_logs with integer category ids.
+        legacy = conn.execute(
+            "SELECT 1 FROM pragma_table_info('service_logs') WHERE name = 'category' AND type = 'TEXT'"
+        ).fetchone()
+        if legacy:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ALTER TABLE service_logs RENAME TO service_logs_legacy")
         conn.execute("""
             CREATE TABLE IF NOT EXISTS service_logs (
                 id              INTEGER PRIMARY KEY AUTOINCREMENT,
                 car_id          INTEGER NOT NULL,
-                category        TEXT NOT NULL,
+                category        INTEGER NOT NULL REFERENCES categories(id),
                 logged_at       TEXT NOT NULL,
                 cost            REAL NOT NULL,
                 provider        TEXT,
@@ -60,15 +252,110 @@ def init_db():
                 FOREIGN KEY (car_id) REFERENCES cars(id)
             )
         """)
-        conn.commit()
+        if legacy:
+            # Refuse to migrate (the borrow rolls back) rather than drop rows
+            # whose category has no id
+            unknown = [r[0] for r in conn.execute("""
+                SELECT DISTINCT o.category
+                FROM service_logs_legacy o LEFT JOIN categories cat ON cat.name = o.category
+                WHERE cat.id IS NULL
+            """)]
+            if unknown:
+                raise RuntimeError(
+                    f"Cannot migrate service_logs: unknown categories {', '.join(unknown)}"
+                )
+            conn.execute("""
+                INSERT INTO service_logs
+                    (id, car_id, category, logged_at, cost, provider, notes,
+                     next_due_date, next_due_km, odometer, created_at)
+                SELECT o.id, o.car_id, cat.id, o.logged_at, o.cost, o.provider, o.notes,
+                       o.next_due_date, o.next_due_km, o.odometer, o.created_at
+                FROM service_logs_legacy o JOIN categories cat ON cat.name = o.category
+            """)
+            # Carry over the AUTOINCREMENT high-water mark so ids of rows
+            # deleted before the migration are never handed out again
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'service_logs'")
+            conn.execute(
+                "UPDATE sqlite_sequence SET name = 'service_logs' WHERE name = 'service_logs_legacy'"
+            )
+            conn.execute("DROP TABLE service_logs_legacy")
+            conn.execute("COMMIT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fuel_car_time    ON fuel_logs(car_id, logged_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_service_car_time ON service_logs(car_id, logged_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_service_car_cat  ON service_logs(car_id, category)")
+
+        # Per-car running totals for /api/stats, kept current by triggers so
+        # the stats endpoint never has to scan fuel_logs.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS fuel_stats (
+                car_id          INTEGER PRIMARY KEY,
+                total_entries   INTEGER NOT NULL,
+                total_fuel      REAL NOT NULL,
+                total_spent     REAL NOT NULL,
+                price_sum       REAL NOT NULL,
+                first_odo       REAL,
+                last_odo        REAL
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_fuel_stats_ins AFTER INSERT ON fuel_logs
+            BEGIN
+                INSERT INTO fuel_stats
+                    (car_id, total_entries, total_fuel, total_spent, price_sum, first_odo, last_odo)
+                VALUES
+                    (NEW.car_id, 1, NEW.fuel_amount, NEW.total_cost, NEW.price_per_unit,
+                     NEW.odometer, NEW.odometer)
+                ON CONFLICT(car_id) DO UPDATE SET
+                    total_entries = total_entries + 1,
+                    total_fuel    = total_fuel    + NEW.fuel_amount,
+                    total_spent   = total_spent   + NEW.total_cost,
+                    price_sum     = price_sum     + NEW.price_per_unit,
+                    first_odo     = COALESCE(MIN(first_odo, NEW.odometer), first_odo, NEW.odometer),
+                    last_odo      = COALESCE(MAX(last_odo,  NEW.odometer), last_odo,  NEW.odometer);
+            END
+        """)
+        # Deletes are rare, so the car's row is recomputed exactly rather than
+        # decremented (MIN/MAX can't be undone, and subtraction drifts).
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_fuel_stats_del AFTER DELETE ON fuel_logs
+            BEGIN
+                DELETE FROM fuel_stats WHERE car_id = OLD.car_id;
+                INSERT INTO fuel_stats
+                SELECT car_id, COUNT(*), SUM(fuel_amount), SUM(total_cost), SUM(price_per_unit),
+                       MIN(odometer), MAX(odometer)
+                FROM fuel_logs WHERE car_id = OLD.car_id
+                GROUP BY car_id;
+            END
+        """)
+        # Rebuild once at startup so totals match rows written before the triggers existed
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM fuel_stats")
+        conn.execute("""
+            INSERT INTO fuel_stats
+            SELECT car_id, COUNT(*), SUM(fuel_amount), SUM(total_cost), SUM(price_per_unit),
+                   MIN(odometer), MAX(odometer)
+            FROM fuel_logs
+            GROUP BY car_id
+        """)
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
 
 # ── CARS ──────────────────────────────────────────────────────────────────────
 
+SQL_GET_CARS   = """
+    SELECT json_group_array(json_object(
+        'id', id, 'registration', registration,
+        'description', description, 'created_at', created_at
+    ))
+    FROM (SELECT * FROM cars ORDER BY registration)
+"""
+SQL_INSERT_CAR = "INSERT INTO cars (registration, description) VALUES (?, ?)"
+SQL_DELETE_CAR = "DELETE FROM cars WHERE id = ?"
+
 @app.route("/api/cars", methods=["GET"])
 def get_cars():
-    with get_db() as conn:
-        rows = conn.execute("SELECT * FROM cars ORDER BY registration").fetchall()
-    return jsonify([dict(r) for r in rows])
+    with pool.borrow() as conn:
+        return json_document(conn.execute(SQL_GET_CARS))
 
 @app.route("/api/cars", methods=["POST"])
 def add_car():
@@ -77,205 +364,311 @@ def add_car():
         return jsonify({"error": "registration and description are required"}), 400
     reg = data["registration"].strip().upper()
     try:
-        with get_db() as conn:
-            cursor = conn.execute(
-                "INSERT INTO cars (registration, description) VALUES (?, ?)",
-                (reg, data["description"].strip())
-            )
-            conn.commit()
+        with pool.borrow() as conn:
+            cursor = conn.execute(SQL_INSERT_CAR, (reg, data["description"].strip()))
             return jsonify({"id": cursor.lastrowid, "registration": reg}), 201
     except sqlite3.IntegrityError:
         return jsonify({"error": f"Registration '{reg}' already exists"}), 409
 
 @app.route("/api/cars/<int:car_id>", methods=["DELETE"])
 def delete_car(car_id):
-    with get_db() as conn:
-        conn.execute("DELETE FROM cars WHERE id = ?", (car_id,))
-        conn.commit()
+    with pool.borrow() as conn:
+        conn.execute(SQL_DELETE_CAR, (car_id,))
     return jsonify({"deleted": car_id})
 
 # ── FUEL LOGS ─────────────────────────────────────────────────────────────────
 
+# Per-trip consumption is computed against the previous fill *with* an
+# odometer reading, so fills without one get their own window partition.
+SQL_GET_LOGS = """
+    WITH trips AS (
+        SELECT fl.*, c.registration, c.description AS car_description,
+               fl.odometer - LAG(fl.odometer) OVER w AS dist
+        FROM fuel_logs fl JOIN cars c ON fl.car_id = c.id
+        {where}
+        WINDOW w AS (PARTITION BY fl.car_id, fl.odometer IS NULL
+                     ORDER BY fl.logged_at, fl.id)
+    )
+    SELECT
+        id, car_id, logged_at, fuel_amount, fuel_unit, price_per_unit,
+        total_cost, odometer, notes, created_at, registration, car_description,
+        CASE WHEN dist > 0 THEN ROUND(dist, 1)                      END AS distance_km,
+        CASE WHEN dist > 0 THEN ROUND(fuel_amount / dist * 100, 2) END AS consumption_per100,
+        CASE WHEN dist > 0 THEN ROUND(total_cost / dist, 4)        END AS rand_per_km,
+        CASE WHEN dist > 0 THEN ROUND(price_per_unit, 4)           END AS rand_per_litre_trip
+    FROM trips
+    ORDER BY logged_at DESC, id DESC
+"""
+SQL_GET_LOGS_ALL    = SQL_GET_LOGS.format(where="")
+SQL_GET_LOGS_BY_CAR = SQL_GET_LOGS.format(where="WHERE fl.car_id = ?")
+
+# Ids are AUTOINCREMENT and never reused, so (count, max id) changes on every
+# insert or delete. Cars are included because deleting one drops its logs
+# from the JOIN.
+SQL_LOGS_VERSION = """
+    SELECT
+        (SELECT COALESCE(SUM(total_entries), 0) FROM fuel_stats {where}),
+        (SELECT COALESCE(MAX(id), 0)            FROM fuel_logs  {where}),
+        (SELECT COUNT(*)                        FROM cars),
+        (SELECT COALESCE(MAX(id), 0)            FROM cars)
+"""
+SQL_LOGS_VERSION_ALL    = SQL_LOGS_VERSION.format(where="")
+SQL_LOGS_VERSION_BY_CAR = SQL_LOGS_VERSION.format(where="WHERE car_id = :car_id")
+
+SQL_INSERT_LOG = """
+    INSERT INTO fuel_logs
+        (car_id, logged_at, fuel_amount, fuel_unit, price_per_unit, total_cost, odometer, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_DELETE_LOG = "DELETE FROM fuel_logs WHERE id = ?"
+
 @app.route("/api/logs", methods=["GET"])
 def get_logs():
     car_id = request.args.get("car_id")
-    with get_db() as conn:
-        if car_id:
-            rows = conn.execute("""
-                SELECT fl.*, c.registration, c.description as car_description
-                FROM fuel_logs fl JOIN cars c ON fl.car_id = c.id
-                WHERE fl.car_id = ?
-                ORDER BY fl.logged_at ASC
-            """, (car_id,)).fetchall()
-        else:
-            rows = conn.execute("""
-                SELECT fl.*, c.registration, c.description as car_description
-                FROM fuel_logs fl JOIN cars c ON fl.car_id = c.id
-                ORDER BY fl.logged_at ASC
-            """).fetchall()
-
-    logs = [dict(r) for r in rows]
-
-    # Group by car and compute per-trip consumption
-    by_car = defaultdict(list)
-    for log in logs:
-        by_car[log["car_id"]].append(log)
-
-    for car_logs in by_car.values():
-        with_odo = [l for l in car_logs if l["odometer"] is not None]
-        with_odo.sort(key=lambda x: x["logged_at"])
-        for i, log in enumerate(with_odo):
-            if i == 0:
-                log["distance_km"]        = None
-                log["consumption_per100"] = None
-                log["rand_per_km"]        = None
-                log["rand_per_litre_trip"] = None
-            else:
-                prev = with_odo[i - 1]
-                dist = log["odometer"] - prev["odometer"]
-                if dist > 0:
-                    log["distance_km"]         = round(dist, 1)
-                    log["consumption_per100"]  = round((log["fuel_amount"] / dist) * 100, 2)
-                    log["rand_per_km"]         = round(log["total_cost"] / dist, 4)
-                    log["rand_per_litre_trip"] = round(log["price_per_unit"], 4)
-                else:
-                    log["distance_km"]         = None
-                    log["consumption_per100"]  = None
-                    log["rand_per_km"]         = None
-                    log["rand_per_litre_trip"] = None
-
-    logs.sort(key=lambda x: x["logged_at"], reverse=True)
-    return jsonify(logs)
+    sql, args = (SQL_GET_LOGS_BY_CAR, (car_id,)) if car_id else (SQL_GET_LOGS_ALL, ())
+    version   = SQL_LOGS_VERSION_BY_CAR if car_id else SQL_LOGS_VERSION_ALL
+    ndjson    = wants_ndjson()
+    with pool.borrow() as conn:
+        tag = ("nd-" if ndjson else "") + version_tag(conn, version, {"car_id": car_id})
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        if not ndjson:
+            return tagged(json_rows(conn.execute(sql, args)), tag)
+    return tagged(ndjson_rows(sql, args), tag)
+
+# Fuel entries are validated more tightly than the old per-field checks:
+# fuel_amount and price_per_unit must be positive, since total_cost and
+# every per-trip figure are derived from them.
+class FuelLogIn(EntryIn):
+    car_id:         int
+    logged_at:      NonEmptyStr
+    fuel_amount:    PositiveFloat
+    fuel_unit:      NonEmptyStr
+    price_per_unit: PositiveFloat
+    odometer:       BlankableFloat  = None
+    notes:          Optional[str]   = ""
+
+    def __post_init__(self):
+        super().__post_init__()
+        # Two finite inputs can still overflow to an infinite total_cost
+        if not math.isfinite(self.fuel_amount * self.price_per_unit):
+            raise ValueError("`fuel_amount` * `price_per_unit` must be a finite number")
+
+def fuel_log_params(entry):
+    """Build the SQL_INSERT_LOG parameters for one validated entry."""
+    total_cost = round(entry.fuel_amount * entry.price_per_unit, 2)
+    return (
+        entry.car_id, entry.logged_at,
+        entry.fuel_amount, entry.fuel_unit,
+        entry.price_per_unit, total_cost,
+        entry.odometer or None, entry.notes
+    )
 
 @app.route("/api/logs", methods=["POST"])
 def add_log():
-    data = request.get_json()
-    for field in ["car_id", "logged_at", "fuel_amount", "fuel_unit", "price_per_unit"]:
-        if not data.get(field):
-            return jsonify({"error": f"Missing field: {field}"}), 400
-
-    total_cost = round(float(data["fuel_amount"]) * float(data["price_per_unit"]), 2)
-    with get_db() as conn:
-        cursor = conn.execute("""
-            INSERT INTO fuel_logs
-                (car_id, logged_at, fuel_amount, fuel_unit, price_per_unit, total_cost, odometer, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data["car_id"], data["logged_at"],
-            float(data["fuel_amount"]), data["fuel_unit"],
-            float(data["price_per_unit"]), total_cost,
-            float(data["odometer"]) if data.get("odometer") else None,
-            data.get("notes", "")
-        ))
-        conn.commit()
-    return jsonify({"id": cursor.lastrowid, "total_cost": total_cost}), 201
+    # Accepts a single entry or a JSON array of entries for bulk import
+    try:
+        data = decode_entries(FuelLogIn)
+    except msgspec.DecodeError as e:
+        return jsonify({"error": str(e)}), 400
+    batch = data if isinstance(data, list) else [data]
+    if not batch:
+        return jsonify({"error": "No entries given"}), 400
+    params = [fuel_log_params(entry) for entry in batch]
+
+    with pool.borrow() as conn:
+        ids = insert_batch(conn, SQL_INSERT_LOG, params)
+    created = [{"id": log_id, "total_cost": row[5]} for log_id, row in zip(ids, params)]
+    return jsonify(created if isinstance(data, list) else created[0]), 201
 
 @app.route("/api/logs/<int:log_id>", methods=["DELETE"])
 def delete_log(log_id):
-    with get_db() as conn:
-        conn.execute("DELETE FROM fuel_logs WHERE id = ?", (log_id,))
-        conn.commit()
+    with pool.borrow() as conn:
+        conn.execute(SQL_DELETE_LOG, (log_id,))
     return jsonify({"deleted": log_id})
 
 # ── STATS ─────────────────────────────────────────────────────────────────────
 
+SQL_STATS = """
+    WITH fuel_agg AS (
+        SELECT
+            COALESCE(SUM(total_entries), 0)                  AS total_entries,
+            COALESCE(SUM(total_fuel),    0)                  AS total_fuel,
+            COALESCE(SUM(total_spent),   0)                  AS total_spent,
+            COALESCE(SUM(price_sum) / SUM(total_entries), 0) AS avg_price_per_unit,
+            MIN(first_odo)                                   AS first_odo,
+            MAX(last_odo)                                    AS last_odo
+        FROM fuel_stats {where}
+    ),
+    svc_by_cat AS (
+        SELECT cat.name AS category, COALESCE(SUM(cost),0) AS total, COUNT(*) AS count
+        FROM service_logs sl JOIN categories cat ON cat.id = sl.category
+        {where}
+        GROUP BY sl.category
+    ),
+    svc_agg AS (
+        SELECT
+            json_group_array(json_object('category', category, 'total', total, 'count', count))
+                                             AS service_breakdown,
+            COALESCE(SUM(total), 0)          AS total_service_cost
+        FROM svc_by_cat
+    )
+    SELECT
+        fuel_agg.*, svc_agg.*,
+        CASE WHEN last_odo > first_odo
+             THEN ROUND(last_odo - first_odo, 1)                      END AS total_distance_km,
+        CASE WHEN last_odo > first_odo
+             THEN ROUND(total_fuel / (last_odo - first_odo) * 100, 2) END AS avg_consumption_per100,
+        CASE WHEN last_odo > first_odo
+             THEN ROUND(total_spent / (last_odo - first_odo), 4)      END AS overall_rand_per_km,
+        CASE WHEN total_fuel > 0
+             THEN ROUND(total_spent / total_fuel, 4)                  END AS overall_rand_per_litre
+    FROM fuel_agg, svc_agg
+"""
+SQL_STATS_ALL    = SQL_STATS.format(where="")
+SQL_STATS_BY_CAR = SQL_STATS.format(where="WHERE car_id = :car_id")
+
+# See SQL_LOGS_VERSION; service rows feed the breakdown, so they count too.
+SQL_STATS_VERSION = """
+    SELECT
+        (SELECT COALESCE(SUM(total_entries), 0) FROM fuel_stats   {where}),
+        (SELECT COALESCE(MAX(id), 0)            FROM fuel_logs    {where}),
+        (SELECT COUNT(*)                        FROM service_logs {where}),
+        (SELECT COALESCE(MAX(id), 0)            FROM service_logs {where})
+"""
+SQL_STATS_VERSION_ALL    = SQL_STATS_VERSION.format(where="")
+SQL_STATS_VERSION_BY_CAR = SQL_STATS_VERSION.format(where="WHERE car_id = :car_id")
+
 @app.route("/api/stats", methods=["GET"])
 def get_stats():
     car_id = request.args.get("car_id")
-    where  = "WHERE car_id = ?" if car_id else ""
-    args   = (car_id,) if car_id else ()
-    with get_db() as conn:
-        base = conn.execute(f"""
-            SELECT
-                COUNT(*)                         AS total_entries,
-                COALESCE(SUM(fuel_amount),  0)   AS total_fuel,
-                COALESCE(SUM(total_cost),   0)   AS total_spent,
-                COALESCE(AVG(price_per_unit),0)  AS avg_price_per_unit,
-                MIN(odometer)                    AS first_odo,
-                MAX(odometer)                    AS last_odo
-            FROM fuel_logs {where}
-        """, args).fetchone()
-        stats = dict(base)
-
-        first_odo, last_odo = stats["first_odo"], stats["last_odo"]
-        if first_odo is not None and last_odo is not None and last_odo > first_odo:
-            dist = last_odo - first_odo
-            stats["total_distance_km"]      = round(dist, 1)
-            stats["avg_consumption_per100"] = round((stats["total_fuel"] / dist) * 100, 2)
-            stats["overall_rand_per_km"]    = round(stats["total_spent"] / dist, 4)
-        else:
-            stats["total_distance_km"]      = None
-            stats["avg_consumption_per100"] = None
-            stats["overall_rand_per_km"]    = None
+    sql     = SQL_STATS_BY_CAR         if car_id else SQL_STATS_ALL
+    version = SQL_STATS_VERSION_BY_CAR if car_id else SQL_STATS_VERSION_ALL
+    args    = {"car_id": car_id}
+    with pool.borrow() as conn:
+        tag = version_tag(conn, version, args)
+        unchanged = not_modified(tag)
+        if unchanged:
+            return unchanged
+        row = conn.execute(sql, args).fetchone()
+    stats = dict(row)
+    stats["service_breakdown"] = orjson.loads(stats["service_breakdown"])
+    return tagged(jsonify(stats), tag)
 
-        stats["overall_rand_per_litre"] = (
-            round(stats["total_spent"] / stats["total_fuel"], 4)
-            if stats["total_fuel"] > 0 else None
-        )
+# ── SERVICE LOGS ──────────────────────────────────────────────────────────────
 
-        svc = conn.execute(f"""
-            SELECT category, COALESCE(SUM(cost),0) AS total, COUNT(*) AS count
-            FROM service_logs {where}
-            GROUP BY category
-        """, args).fetchall()
-        stats["service_breakdown"] = [dict(r) for r in svc]
-        stats["total_service_cost"] = sum(r["total"] for r in svc)
+# Service categories are stored as small integer ids; the ids are fixed here
+# and seeded into the categories table by init_db().
+CATEGORIES = ("tyres", "car_wash", "car_service", "panel_beating", "special_service")
+CAT_TO_ID  = {name: cid for cid, name in enumerate(CATEGORIES, start=1)}
 
-    return jsonify(stats)
+SQL_INSERT_SERVICE = """
+    INSERT INTO service_logs
+        (car_id, category, logged_at, cost, provider, notes, next_due_date, next_due_km, odometer)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_DELETE_SERVICE = "DELETE FROM service_logs WHERE id = ?"
 
-# ── SERVICE LOGS ──────────────────────────────────────────────────────────────
+SQL_GET_SERVICES = """
+    SELECT json_group_array(json_object(
+        'id', id, 'car_id', car_id, 'category', category_name, 'logged_at', logged_at,
+        'cost', cost, 'provider', provider, 'notes', notes,
+        'next_due_date', next_due_date, 'next_due_km', next_due_km,
+        'odometer', odometer, 'created_at', created_at,
+        'registration', registration, 'car_description', car_description
+    ))
+    FROM (
+        SELECT sl.*, cat.name AS category_name,
+               c.registration, c.description as car_description
+        FROM service_logs sl
+        JOIN cars c         ON sl.car_id = c.id
+        JOIN categories cat ON sl.category = cat.id
+        {where}
+        ORDER BY sl.logged_at DESC
+    )
+"""
+SQL_GET_SERVICES_ALL            = SQL_GET_SERVICES.format(where="")
+SQL_GET_SERVICES_BY_CAR         = SQL_GET_SERVICES.format(where="WHERE sl.car_id = :car_id")
+SQL_GET_SERVICES_BY_CAT         = SQL_GET_SERVICES.format(where="WHERE sl.category = :category")
+SQL_GET_SERVICES_BY_CAR_AND_CAT = SQL_GET_SERVICES.format(
+    where="WHERE sl.car_id = :car_id AND sl.category = :category")
 
-VALID_CATEGORIES = {"tyres", "car_wash", "car_service", "panel_beating", "special_service"}
+# Keyed by (car_id given, category given)
+SQL_GET_SERVICES_BY_FILTER = {
+    (False, False): SQL_GET_SERVICES_ALL,
+    (True,  False): SQL_GET_SERVICES_BY_CAR,
+    (False, True):  SQL_GET_SERVICES_BY_CAT,
+    (True,  True):  SQL_GET_SERVICES_BY_CAR_AND_CAT,
+}
 
 @app.route("/api/services", methods=["GET"])
 def get_services():
     car_id   = request.args.get("car_id")
     category = request.args.get("category")
-    conditions, args = [], []
-    if car_id:   conditions.append("sl.car_id = ?");   args.append(car_id)
-    if category: conditions.append("sl.category = ?"); args.append(category)
-    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
-    with get_db() as conn:
-        rows = conn.execute(f"""
-            SELECT sl.*, c.registration, c.description as car_description
-            FROM service_logs sl JOIN cars c ON sl.car_id = c.id
-            {where}
-            ORDER BY sl.logged_at DESC
-        """, args).fetchall()
-    return jsonify([dict(r) for r in rows])
+    sql  = SQL_GET_SERVICES_BY_FILTER[bool(car_id), bool(category)]
+    args = {"car_id": car_id, "category": CAT_TO_ID.get(category)}
+    with pool.borrow() as conn:
+        return json_document(conn.execute(sql, args))
+
+# Service entries keep the original presence-only checks: cost may be zero
+# or negative (refunds, warranty work) and nothing is derived from it.
+class ServiceLogIn(EntryIn):
+    car_id:        int
+    category:      str
+    logged_at:     str
+    cost:          float
+    provider:      Optional[str]   = ""
+    notes:         Optional[str]   = ""
+    next_due_date: Optional[str]   = None
+    next_due_km:   BlankableFloat  = None
+    odometer:      BlankableFloat  = None
+
+def service_params(entry):
+    """Build the SQL_INSERT_SERVICE parameters for one validated entry."""
+    return (
+        entry.car_id, CAT_TO_ID.get(entry.category), entry.logged_at, entry.cost,
+        entry.provider, entry.notes,
+        entry.next_due_date or None,
+        entry.next_due_km   or None,
+        entry.odometer      or None,
+    )
 
 @app.route("/api/services", methods=["POST"])
 def add_service():
-    data = request.get_json()
-    for field in ["car_id", "category", "logged_at", "cost"]:
-        if data.get(field) is None:
-            return jsonify({"error": f"Missing field: {field}"}), 400
-    if data["category"] not in VALID_CATEGORIES:
-        return jsonify({"error": f"Invalid category"}), 400
-    with get_db() as conn:
-        cursor = conn.execute("""
-            INSERT INTO service_logs
-                (car_id, category, logged_at, cost, provider, notes, next_due_date, next_due_km, odometer)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            data["car_id"], data["category"], data["logged_at"], float(data["cost"]),
-            data.get("provider", ""), data.get("notes", ""),
-            data.get("next_due_date") or None,
-            float(data["next_due_km"]) if data.get("next_due_km") else None,
-            float(data["odometer"])    if data.get("odometer")    else None,
-        ))
-        conn.commit()
-    return jsonify({"id": cursor.lastrowid}), 201
+    # Accepts a single entry or a JSON array of entries for bulk import
+    try:
+        data = decode_entries(ServiceLogIn)
+    except msgspec.DecodeError as e:
+        return jsonify({"error": str(e)}), 400
+    batch = data if isinstance(data, list) else [data]
+    if not batch:
+        return jsonify({"error": "No entries given"}), 400
+    params = [service_params(entry) for entry in batch]
+    if any(row[1] is None for row in params):
+        return jsonify({"error": "Invalid category"}), 400
+
+    with pool.borrow() as conn:
+        ids = insert_batch(conn, SQL_INSERT_SERVICE, params)
+    created = [{"id": svc_id} for svc_id in ids]
+    return jsonify(created if isinstance(data, list) else created[0]), 201
 
 @app.route("/api/services/<int:svc_id>", methods=["DELETE"])
 def delete_service(svc_id):
-    with get_db() as conn:
-        conn.execute("DELETE FROM service_logs WHERE id = ?", (svc_id,))
-        conn.commit()
+    with pool.borrow() as conn:
+        conn.execute(SQL_DELETE_SERVICE, (svc_id,))
     return jsonify({"deleted": svc_id})
 
 if __name__ == "__main__":
     init_db()
     print("✅  Fuel Logger running at http://localhost:5000")
     print("📂  Database: fuel_log.db")
-    app.run(debug=True, port=5000)
+    try:
+        if os.environ.get("FUEL_LOG_DEBUG"):
+            app.run(debug=True, port=5000)
+        else:
+            from waitress import serve
+            # One worker thread per pooled connection
+            serve(app, host="127.0.0.1", port=5000, threads=POOL_SIZE, connection_limit=200)
+    finally:
+        pool.close()